@@ -6,30 +6,34 @@ This script extracts captions from Instagram posts using the Instaloader library
 
 import sys
 import json
-import re
 import instaloader
 from urllib.parse import urlparse
 import os
-import time
-import random
+import pickle
+import asyncio
 
-def extract_shortcode_from_url(url):
-    """Extract the shortcode from an Instagram URL."""
-    # Parse the URL
-    parsed_url = urlparse(url)
+try:
+    import aiohttp
+except ImportError:
+    # Only needed for batch extraction
+    aiohttp = None
 
-    # Extract the path
-    path = parsed_url.path
+from insta_common import USER_AGENT, get_loader, extract_shortcode_from_url, parse_post_node, get_post_metadata, check_login_required, record_login_refusal, _SESSION_FILE, serve
+from insta_rate_limiter import get_limiter
+from insta_post_cache import get_cached_post, cache_post
 
-    # Remove trailing slash if present
-    if path.endswith('/'):
-        path = path[:-1]
+# GraphQL endpoint and document used by instagram.com to load a single post
+GRAPHQL_URL = "https://www.instagram.com/graphql/query"
+POST_QUERY_DOC_ID = "8845758582119845"
+INSTAGRAM_APP_ID = "936619743392459"
 
-    # Extract the shortcode (last part of the path)
-    parts = path.split('/')
-    shortcode = parts[-1]
+# Maximum number of concurrent requests made by batch extraction
+BATCH_CONCURRENCY = 8
 
-    return shortcode
+# Retry settings for batch extraction (exponential backoff, in seconds)
+BATCH_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 1
+RETRY_MAX_DELAY = 60
 
 def get_post_caption(url):
     """
@@ -42,55 +46,37 @@ def get_post_caption(url):
         dict: A dictionary containing the caption and other metadata.
     """
     try:
-        # Create an instance of Instaloader with specific options
-        loader = instaloader.Instaloader(
-            quiet=True,
-            download_pictures=False,
-            download_video_thumbnails=False,
-            download_geotags=False,
-            download_comments=False,
-            save_metadata=False,
-            compress_json=False,
-            # Add user agent to avoid being blocked
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            # Add rate limiting to avoid being blocked
-            max_connection_attempts=3
-        )
-
-        # Try to load session if available
-        try:
-            # Check if credentials file exists
-            session_file = os.path.join(os.path.expanduser("~"), ".instaloader", "session-default")
-            if os.path.exists(session_file):
-                print(f"Loading session from {session_file}", file=sys.stderr)
-                loader.load_session_from_file("default")
-                print("Session loaded successfully", file=sys.stderr)
-        except Exception as e:
-            print(f"Could not load session: {str(e)}", file=sys.stderr)
-            # Continue without session
-            pass
-
         # Extract the shortcode from the URL
         shortcode = extract_shortcode_from_url(url)
+        if not shortcode:
+            return {
+                "success": False,
+                "error": f"Could not extract shortcode from URL: {url}",
+                "caption": "Failed to extract caption"
+            }
+
+        # Fail fast on content that needs a login we don't have
+        login_error = check_login_required(url)
+        if login_error:
+            return {
+                "success": False,
+                "error": login_error,
+                "caption": "Failed to extract caption"
+            }
 
-        # Add random delay to avoid rate limiting
-        delay = random.uniform(1, 3)
-        time.sleep(delay)
+        # Use the cached metadata if this post was fetched recently
+        cached = get_cached_post(shortcode)
+        if cached:
+            return cached
+
+        loader = get_loader()
 
         # Get the post
         post = instaloader.Post.from_shortcode(loader.context, shortcode)
 
         # Extract the caption and other metadata
-        result = {
-            "success": True,
-            "caption": post.caption if post.caption else "No caption available",
-            "username": post.owner_username,
-            "likes": post.likes,
-            "comments": post.comments,
-            "date": post.date_local.isoformat(),
-            "is_video": post.is_video,
-            "shortcode": shortcode
-        }
+        result = get_post_metadata(post, shortcode)
+        cache_post(shortcode, result)
 
         return result
 
@@ -101,6 +87,7 @@ def get_post_caption(url):
             "caption": "Failed to extract caption"
         }
     except instaloader.exceptions.LoginRequiredException as e:
+        record_login_refusal()
         return {
             "success": False,
             "error": f"Login required: {str(e)}. This content may require authentication.",
@@ -113,12 +100,221 @@ def get_post_caption(url):
             "caption": "Failed to extract caption"
         }
 
+def load_session_cookies():
+    """
+    Load the cookies saved by Instaloader's save_session_to_file.
+
+    Returns:
+        dict: The session cookies, or an empty dict if no session is available.
+    """
+    if not os.path.exists(_SESSION_FILE):
+        return {}
+
+    try:
+        with open(_SESSION_FILE, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        print(f"Could not load session: {str(e)}", file=sys.stderr)
+        return {}
+
+async def fetch_caption(session, semaphore, url):
+    """
+    Fetch the caption of a single Instagram post with a direct GraphQL query.
+
+    Retries connection errors, rate limiting and server errors with
+    exponential backoff. Other HTTP errors won't go away by retrying, so they
+    are returned straight away.
+
+    Args:
+        session (aiohttp.ClientSession): Session carrying the Instagram cookies.
+        semaphore (asyncio.Semaphore): Semaphore bounding concurrent requests.
+        url (str): The URL of the Instagram post.
+
+    Returns:
+        dict: A dictionary containing the caption and other metadata.
+    """
+    shortcode = extract_shortcode_from_url(url)
+    if not shortcode:
+        return {
+            "success": False,
+            "error": f"Could not extract shortcode from URL: {url}",
+            "caption": "Failed to extract caption"
+        }
+
+    # Use the cached metadata if this post was fetched recently
+    cached = get_cached_post(shortcode)
+    if cached:
+        return cached
+
+    data = {
+        "variables": json.dumps({
+            "shortcode": shortcode,
+            "fetch_tagged_user_count": None,
+            "hoisted_comment_id": None,
+            "hoisted_reply_id": None
+        }),
+        "doc_id": POST_QUERY_DOC_ID,
+        "server_timestamps": "true"
+    }
+    headers = {"Referer": f"https://www.instagram.com/p/{shortcode}/"}
+    limiter = get_limiter(urlparse(GRAPHQL_URL).hostname)
+
+    error = None
+    for attempt in range(BATCH_MAX_ATTEMPTS):
+        if attempt > 0:
+            delay = min(RETRY_BASE_DELAY * 2 ** (attempt - 1), RETRY_MAX_DELAY)
+            await asyncio.sleep(delay)
+
+        try:
+            async with semaphore:
+                await limiter.acquire_async()
+                async with session.post(GRAPHQL_URL, data=data, headers=headers) as response:
+                    limiter.update_from_headers(response.headers)
+                    if response.status == 429 or response.status >= 500:
+                        error = f"Connection error: HTTP {response.status}. Instagram may be rate-limiting requests."
+                        continue
+                    if response.status in (401, 403):
+                        # test_login blocks, so record the refusal off the event loop
+                        await asyncio.get_running_loop().run_in_executor(None, record_login_refusal)
+                        return {
+                            "success": False,
+                            "error": f"Login required: HTTP {response.status}. This content may require authentication.",
+                            "caption": "Failed to extract caption"
+                        }
+                    if response.status != 200:
+                        return {
+                            "success": False,
+                            "error": f"Unexpected response from Instagram: HTTP {response.status}",
+                            "caption": "Failed to extract caption"
+                        }
+                    payload = await response.json(content_type=None)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = f"Connection error: {str(e)}. Instagram may be rate-limiting requests."
+            continue
+        except ValueError as e:
+            return {
+                "success": False,
+                "error": f"Invalid response from Instagram: {str(e)}",
+                "caption": "Failed to extract caption"
+            }
+
+        if not isinstance(payload, dict):
+            return {
+                "success": False,
+                "error": "Invalid response from Instagram: expected a JSON object",
+                "caption": "Failed to extract caption"
+            }
+
+        data = payload.get("data")
+        node = data.get("xdt_shortcode_media") if isinstance(data, dict) else None
+        if not node:
+            return {
+                "success": False,
+                "error": "Login required: post not found in response. This content may require authentication.",
+                "caption": "Failed to extract caption"
+            }
+
+        try:
+            result = parse_post_node(node, shortcode)
+        except (KeyError, TypeError, IndexError) as e:
+            return {
+                "success": False,
+                "error": f"Unexpected response from Instagram: {str(e)}",
+                "caption": "Failed to extract caption"
+            }
+
+        cache_post(shortcode, result)
+        return result
+
+    return {
+        "success": False,
+        "error": error,
+        "caption": "Failed to extract caption"
+    }
+
+async def fetch_captions(urls):
+    """
+    Fetch the captions of many Instagram posts concurrently.
+
+    Args:
+        urls (list[str]): The URLs of the Instagram posts.
+
+    Returns:
+        list[dict]: One result per URL, in the same order as the URLs.
+    """
+    cookies = load_session_cookies()
+    headers = {
+        "User-Agent": USER_AGENT,
+        "X-IG-App-ID": INSTAGRAM_APP_ID,
+        "X-Requested-With": "XMLHttpRequest"
+    }
+    if "csrftoken" in cookies:
+        headers["X-CSRFToken"] = cookies["csrftoken"]
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    connector = aiohttp.TCPConnector(limit_per_host=BATCH_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=30)
+
+    async with aiohttp.ClientSession(connector=connector, cookies=cookies, headers=headers, timeout=timeout) as session:
+        return await asyncio.gather(*[fetch_caption(session, semaphore, url) for url in urls])
+
+def get_post_captions(urls):
+    """
+    Get the captions of many Instagram posts concurrently.
+
+    Unlike get_post_caption, this bypasses Instaloader and queries Instagram's
+    GraphQL API directly with the saved session cookies, overlapping the
+    requests instead of making them one at a time.
+
+    Args:
+        urls (list[str]): The URLs of the Instagram posts.
+
+    Returns:
+        list[dict]: One result per URL, in the same order as the URLs.
+    """
+    if aiohttp is None:
+        return [{
+            "success": False,
+            "error": "aiohttp module not found. Please install it with 'pip install aiohttp'",
+            "caption": "Failed to extract caption"
+        } for url in urls]
+
+    return asyncio.run(fetch_captions(urls))
+
+def handle(request):
+    """
+    Handle a single worker request.
+
+    Args:
+        request (dict): The request, containing the "url" of the Instagram post.
+
+    Returns:
+        dict: The result of get_post_caption for the requested URL.
+    """
+    url = request.get("url")
+    if not url:
+        return {"success": False, "error": "No URL provided"}
+
+    return get_post_caption(url)
+
 if __name__ == "__main__":
     # Check if a URL was provided
     if len(sys.argv) < 2:
         print(json.dumps({"success": False, "error": "No URL provided"}))
         sys.exit(1)
 
+    # Run as a long-lived worker reading requests from stdin
+    if sys.argv[1] == "--serve":
+        serve(handle)
+        sys.exit(0)
+
+    # Read one URL per line from stdin and print one JSON result per line
+    if sys.argv[1] == "--batch":
+        urls = [line.strip() for line in sys.stdin if line.strip()]
+        for result in get_post_captions(urls):
+            print(json.dumps(result))
+        sys.exit(0)
+
     # Get the URL from command line arguments
     url = sys.argv[1]
 
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Shared Helpers for the Instagram Scripts
+This module contains code shared by the Instaloader caption extractor and media downloader.
+"""
+
+import sys
+import os
+import json
+import re
+import time
+import functools
+import threading
+import instaloader
+from datetime import datetime
+from urllib3.util.request import ACCEPT_ENCODING
+
+from insta_rate_limiter import install_rate_limiter
+
+# Add user agent to avoid being blocked
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Matches the shortcode in Instagram post, reel and IGTV URLs
+_SHORTCODE_RE = re.compile(r'/(?:p|reel|reels|tv)/([A-Za-z0-9_-]+)')
+
+# Session saved by `instaloader --login`, resolved once when the module is imported
+_SESSION_FILE = os.path.join(os.path.expanduser("~"), ".instaloader", "session-default")
+_SESSION_EXISTS = os.path.isfile(_SESSION_FILE)
+
+# How long a verdict on the session is trusted before it is checked again (in seconds)
+SESSION_RECHECK_INTERVAL = 300
+
+# Whether Instagram accepts the session (None until checked), and when that was last found out
+_SESSION_VALID = None
+_SESSION_CHECKED_AT = 0.0
+_SESSION_CHECK_LOCK = threading.Lock()
+
+# Paths of Instagram URLs that are only served to logged in users
+_LOGIN_REQUIRED_RE = re.compile(r'/stories/')
+
+def extract_shortcode_from_url(url):
+    """
+    Extract the shortcode from an Instagram URL.
+
+    Args:
+        url (str): The URL of the Instagram post.
+
+    Returns:
+        str: The shortcode, or None if the URL isn't an Instagram post URL.
+    """
+    match = _SHORTCODE_RE.search(url)
+    return match.group(1) if match else None
+
+def parse_post_node(node, shortcode):
+    """
+    Build a caption result from a GraphQL post node.
+
+    Args:
+        node (dict): The post node returned by Instagram's GraphQL API.
+        shortcode (str): The shortcode of the post.
+
+    Returns:
+        dict: A dictionary containing the caption and other metadata.
+
+    Raises:
+        KeyError: If the node is missing any of the metadata fields.
+    """
+    caption_edges = node.get("edge_media_to_caption", {}).get("edges", [])
+    caption = caption_edges[0]["node"].get("text") if caption_edges else None
+    comments = node.get("edge_media_to_parent_comment") or node["edge_media_to_comment"]
+
+    return {
+        "success": True,
+        "caption": caption if caption else "No caption available",
+        "username": node["owner"]["username"],
+        "likes": node["edge_media_preview_like"]["count"],
+        "comments": comments["count"],
+        "date": datetime.fromtimestamp(node["taken_at_timestamp"]).astimezone().isoformat(),
+        "is_video": node["is_video"],
+        "shortcode": shortcode
+    }
+
+def get_post_metadata(post, shortcode):
+    """
+    Get the caption and other metadata of an Instagram post.
+
+    Reads the GraphQL node that Post.from_shortcode already fetched, so no
+    further requests are made. This relies on Post._node, an internal of
+    Instaloader 4.x; if a field is missing there, the Post properties are
+    used instead, which may fetch the missing data lazily.
+
+    Args:
+        post (instaloader.Post): The Instagram post.
+        shortcode (str): The shortcode of the post.
+
+    Returns:
+        dict: A dictionary containing the caption and other metadata.
+    """
+    try:
+        return parse_post_node(post._node, shortcode)
+    except (AttributeError, KeyError, TypeError, IndexError):
+        pass
+
+    return {
+        "success": True,
+        "caption": post.caption if post.caption else "No caption available",
+        "username": post.owner_username,
+        "likes": post.likes,
+        "comments": post.comments,
+        "date": post.date_local.isoformat(),
+        "is_video": post.is_video,
+        "shortcode": shortcode
+    }
+
+def tune_session(session):
+    """
+    Configure the Instaloader session to accept compressed responses.
+
+    Advertises every content encoding urllib3 can decode (including Brotli
+    when the brotli package is installed). Instaloader runs GraphQL queries on
+    copies of this session, which keep its headers but not its adapters, so
+    connection pool settings made here would only apply to direct requests.
+
+    Args:
+        session (requests.Session): The session to configure.
+    """
+    session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+
+def _requires_login_heuristic(url):
+    """
+    Guess whether an Instagram URL can only be fetched when logged in.
+
+    Args:
+        url (str): The Instagram URL.
+
+    Returns:
+        bool: True if the URL points at content Instagram only shows to logged in users.
+    """
+    return bool(_LOGIN_REQUIRED_RE.search(url))
+
+def _session_check_expired():
+    return _SESSION_VALID is None or time.monotonic() - _SESSION_CHECKED_AT >= SESSION_RECHECK_INTERVAL
+
+def _check_session():
+    """Ask Instagram whether it accepts the saved session, recording the answer."""
+    global _SESSION_VALID, _SESSION_CHECKED_AT
+    try:
+        valid = get_loader().context.test_login() is not None
+    except Exception as e:
+        # Couldn't tell, so don't turn requests away because of it
+        print(f"Could not check session: {str(e)}", file=sys.stderr)
+        valid = True
+    if not valid:
+        print("Saved session is no longer valid", file=sys.stderr)
+
+    _SESSION_VALID = valid
+    _SESSION_CHECKED_AT = time.monotonic()
+
+def record_login_refusal():
+    """
+    Note that Instagram refused a request for want of a login.
+
+    Called when a request raises LoginRequiredException. Private posts are
+    refused even with a valid session, so the saved session is only deemed
+    expired once test_login confirms it; check_login_required then turns every
+    URL away for SESSION_RECHECK_INTERVAL seconds without spending a request on
+    it. Without a saved session there is nothing to expire, and public posts
+    can still be fetched anonymously.
+    """
+    # Batch extraction records refusals from several threads at once
+    with _SESSION_CHECK_LOCK:
+        if _SESSION_EXISTS and _session_check_expired():
+            _check_session()
+
+def check_login_required(url):
+    """
+    Check up front whether a URL would fail for lack of a valid session.
+
+    Lets callers fail fast with the same error for every such URL, instead of
+    each one spending a rate limited request to discover that the session has
+    expired. Only URLs that look login-only trigger a check against Instagram,
+    and its verdict is trusted for SESSION_RECHECK_INTERVAL seconds.
+
+    Args:
+        url (str): The Instagram URL.
+
+    Returns:
+        str: An error message if the URL needs a login and there's no valid session, otherwise None.
+    """
+    if not _SESSION_EXISTS:
+        if _requires_login_heuristic(url):
+            return "Login required: no Instagram session found. Log in with 'instaloader --login'."
+        return None
+
+    if _session_check_expired():
+        if not _requires_login_heuristic(url):
+            return None
+        _check_session()
+
+    # A session known to have expired rules out every URL until the next check is due
+    if not _SESSION_VALID:
+        return "Login required: the saved Instagram session has expired. Log in again with 'instaloader --login'."
+    return None
+
+@functools.lru_cache(maxsize=1)
+def get_loader():
+    """
+    Get the shared Instaloader instance, creating it on first use.
+
+    A single instance is shared by every request handled by the process, so
+    the session file is read once and its HTTP connections are reused.
+
+    Returns:
+        instaloader.Instaloader: The shared Instaloader instance.
+    """
+    # Create an instance of Instaloader with specific options
+    # quiet=True suppresses terminal output
+    # download_pictures=False to skip downloading images
+    # download_video_thumbnails=False to skip thumbnails
+    loader = instaloader.Instaloader(
+        quiet=True,
+        download_pictures=False,
+        download_video_thumbnails=False,
+        download_geotags=False,
+        download_comments=False,
+        save_metadata=False,
+        compress_json=False,
+        user_agent=USER_AGENT,
+        # Instaloader sleeps before every request by default. Pacing is left to
+        # the rate limiter installed below instead, which only waits when
+        # Instagram's rate limit headers say the quota is spent
+        sleep=False,
+        max_connection_attempts=3
+    )
+
+    # Load the saved session if there is one
+    if _SESSION_EXISTS:
+        try:
+            print(f"Loading session from {_SESSION_FILE}", file=sys.stderr)
+            loader.load_session_from_file("default", _SESSION_FILE)
+            print("Session loaded successfully", file=sys.stderr)
+        except Exception as e:
+            # Continue without session
+            print(f"Could not load session: {str(e)}", file=sys.stderr)
+
+    # Loading a session replaces the requests session, so tune it afterwards
+    tune_session(loader.context._session)
+
+    # Pace requests according to Instagram's rate limits
+    install_rate_limiter(loader)
+
+    return loader
+
+def serve(handle):
+    """
+    Serve requests read from stdin, one JSON object per line.
+
+    Each result is written to stdout as a single JSON line. If the request
+    carries an "id" it is echoed back so callers can match results to requests.
+
+    Args:
+        handle (callable): Called with each request dict, returning the result dict.
+    """
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            print(json.dumps({"success": False, "error": f"Invalid request: {str(e)}"}), flush=True)
+            continue
+
+        if not isinstance(request, dict):
+            print(json.dumps({"success": False, "error": "Invalid request: expected a JSON object"}), flush=True)
+            continue
+
+        result = handle(request)
+        if "id" in request:
+            result["id"] = request["id"]
+
+        print(json.dumps(result), flush=True)
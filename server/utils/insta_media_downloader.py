@@ -7,31 +7,158 @@ This script downloads media (video/audio) from Instagram posts using the Instalo
 import sys
 import json
 import os
-import re
 import instaloader
-from urllib.parse import urlparse
-import tempfile
 import shutil
-import time
-import random
+import asyncio
 
-def extract_shortcode_from_url(url):
-    """Extract the shortcode from an Instagram URL."""
-    # Parse the URL
-    parsed_url = urlparse(url)
+try:
+    import aiohttp
+except ImportError:
+    # Only needed for parallel range downloads
+    aiohttp = None
 
-    # Extract the path
-    path = parsed_url.path
+from insta_common import USER_AGENT, get_loader, extract_shortcode_from_url, get_post_metadata, check_login_required, record_login_refusal, serve
+from insta_post_cache import cache_post
 
-    # Remove trailing slash if present
-    if path.endswith('/'):
-        path = path[:-1]
+# Buffer size used when streaming videos to disk
+DOWNLOAD_CHUNK_SIZE = 1 << 20
 
-    # Extract the shortcode (last part of the path)
-    parts = path.split('/')
-    shortcode = parts[-1]
+# Timeout for video downloads (in seconds)
+DOWNLOAD_TIMEOUT = 30
 
-    return shortcode
+# Number of concurrent range requests used to download a video
+RANGE_CONNECTIONS = 4
+
+# Videos smaller than this are downloaded with a single request (in bytes)
+RANGE_MIN_SIZE = 2 << 20
+
+def get_video_url(post):
+    """
+    Get the URL of the video in an Instagram post.
+
+    Args:
+        post (instaloader.Post): The Instagram post.
+
+    Returns:
+        str: The video URL, or None if the post contains no video.
+    """
+    if post.is_video:
+        return post.video_url
+
+    # For carousel posts, use the first video in the carousel
+    if post.typename == "GraphSidecar":
+        for node in post.get_sidecar_nodes():
+            if node.is_video:
+                return node.video_url
+
+    return None
+
+async def fetch_range(session, video_url, fd, start, end):
+    """
+    Download one byte range of a video into an open file.
+
+    Args:
+        session (aiohttp.ClientSession): The HTTP session.
+        video_url (str): The URL of the video.
+        fd (int): File descriptor of the output file.
+        start (int): First byte of the range.
+        end (int): Last byte of the range (inclusive).
+
+    Returns:
+        bool: True if the whole range was written, False if the server didn't honour the range.
+    """
+    async with session.get(video_url, headers={"Range": f"bytes={start}-{end}"}) as response:
+        if response.status != 206:
+            return False
+
+        offset = start
+        async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+
+        return offset == end + 1
+
+async def download_video_ranges(video_url, path):
+    """
+    Download a video with concurrent HTTP range requests.
+
+    No cookies are sent: video URLs are signed CDN URLs, and the Instagram
+    session cookies must not leak to other hosts.
+
+    Args:
+        video_url (str): The URL of the video.
+        path (str): Path to save the video to.
+
+    Returns:
+        bool: True if the video was downloaded, False if it should be downloaded
+            with a single request instead.
+    """
+    headers = {"User-Agent": USER_AGENT, "Referer": "https://www.instagram.com/"}
+    # Limit connecting and each read, not the whole download, which can take a while for long videos
+    timeout = aiohttp.ClientTimeout(sock_connect=DOWNLOAD_TIMEOUT, sock_read=DOWNLOAD_TIMEOUT)
+
+    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
+        async with session.head(video_url, allow_redirects=True) as response:
+            if response.status != 200 or response.headers.get("Accept-Ranges") != "bytes":
+                return False
+            size = int(response.headers.get("Content-Length", 0))
+
+        if size < RANGE_MIN_SIZE:
+            return False
+
+        # Split the video into one range per connection
+        range_size = -(-size // RANGE_CONNECTIONS)
+        ranges = [(start, min(start + range_size, size) - 1) for start in range(0, size, range_size)]
+
+        # Preallocate the file so each range can be written at its own offset
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        tasks = []
+        try:
+            os.ftruncate(fd, size)
+            tasks = [asyncio.create_task(fetch_range(session, video_url, fd, start, end)) for start, end in ranges]
+            results = await asyncio.gather(*tasks)
+        finally:
+            # If one range failed, stop the others before their file descriptor is closed
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            os.close(fd)
+
+        return all(results)
+
+def download_video(loader, video_url, output_path):
+    """
+    Download a video to disk.
+
+    The video is written once, straight to its destination. Large videos are
+    fetched over RANGE_CONNECTIONS parallel range requests when aiohttp is
+    installed and the server supports ranges; otherwise the video is streamed
+    with Instaloader's get_raw, which like the range requests uses an anonymous
+    session so the Instagram session cookies aren't sent to the CDN.
+
+    Args:
+        loader (instaloader.Instaloader): The Instaloader instance.
+        video_url (str): The URL of the video.
+        output_path (str): Path to save the video to.
+    """
+    # Write to a partial file first so a failed download never leaves a truncated video behind
+    partial_path = f"{output_path}.part"
+    try:
+        if aiohttp is not None:
+            try:
+                if asyncio.run(download_video_ranges(video_url, partial_path)):
+                    os.replace(partial_path, output_path)
+                    return
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Range download failed, falling back to a single request: {str(e)}", file=sys.stderr)
+
+        with loader.context.get_raw(video_url) as response:
+            with open(partial_path, "wb") as f:
+                shutil.copyfileobj(response.raw, f, length=DOWNLOAD_CHUNK_SIZE)
+        os.replace(partial_path, output_path)
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
 
 def download_instagram_media(url, output_dir):
     """
@@ -45,88 +172,57 @@ def download_instagram_media(url, output_dir):
         dict: A dictionary containing the download results and metadata.
     """
     try:
-        # Create an instance of Instaloader with specific options
-        # quiet=True suppresses terminal output
-        # download_pictures=False to skip downloading images
-        # download_video_thumbnails=False to skip thumbnails
-        loader = instaloader.Instaloader(
-            quiet=True,
-            download_pictures=False,
-            download_video_thumbnails=False,
-            download_geotags=False,
-            download_comments=False,
-            save_metadata=True,
-            compress_json=False,
-            # Add user agent to avoid being blocked
-            user_agent="Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            # Add rate limiting to avoid being blocked
-            max_connection_attempts=3
-        )
-
-        # Try to load session if available
-        try:
-            # Check if credentials file exists
-            session_file = os.path.join(os.path.expanduser("~"), ".instaloader", "session-default")
-            if os.path.exists(session_file):
-                print(f"Loading session from {session_file}", file=sys.stderr)
-                loader.load_session_from_file("default")
-                print("Session loaded successfully", file=sys.stderr)
-        except Exception as e:
-            print(f"Could not load session: {str(e)}", file=sys.stderr)
-            # Continue without session
-            pass
+        loader = get_loader()
 
         # Extract the shortcode from the URL
         shortcode = extract_shortcode_from_url(url)
+        if not shortcode:
+            return {
+                "success": False,
+                "error": f"Could not extract shortcode from URL: {url}",
+                "media_path": None,
+                "caption": None
+            }
 
-        # Add random delay to avoid rate limiting
-        delay = random.uniform(1, 3)
-        time.sleep(delay)
+        # Fail fast on content that needs a login we don't have
+        login_error = check_login_required(url)
+        if login_error:
+            return {
+                "success": False,
+                "error": login_error,
+                "media_path": None,
+                "caption": None
+            }
 
         # Get the post
         post = instaloader.Post.from_shortcode(loader.context, shortcode)
 
-        # Create a temporary directory for downloading
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Download the post to the temporary directory
-            loader.download_post(post, target=temp_dir)
-
-            # Find the video file in the temp directory
-            video_file = None
-            for file in os.listdir(temp_dir):
-                if file.endswith('.mp4'):
-                    video_file = os.path.join(temp_dir, file)
-                    break
-
-            if not video_file:
-                return {
-                    "success": False,
-                    "error": "No video file found in the downloaded content",
-                    "media_path": None,
-                    "caption": None
-                }
+        # Find the video to download
+        video_url = get_video_url(post)
+        if not video_url:
+            return {
+                "success": False,
+                "error": "No video found in the post",
+                "media_path": None,
+                "caption": None
+            }
 
-            # Generate output filename based on shortcode
-            output_filename = f"reel_{shortcode}.mp4"
-            output_path = os.path.join(output_dir, output_filename)
+        # Generate output filename based on shortcode
+        output_filename = f"reel_{shortcode}.mp4"
+        output_path = os.path.join(output_dir, output_filename)
 
-            # Copy the video file to the output directory
-            shutil.copy2(video_file, output_path)
+        # Stream the video straight to the output directory
+        download_video(loader, video_url, output_path)
 
-            # Extract caption and other metadata
-            caption = post.caption if post.caption else "No caption available"
+        # Extract caption and other metadata, caching it for later caption lookups
+        metadata = get_post_metadata(post, shortcode)
+        cache_post(shortcode, metadata)
 
-            return {
-                "success": True,
-                "media_path": output_path,
-                "caption": caption,
-                "username": post.owner_username,
-                "likes": post.likes,
-                "comments": post.comments,
-                "date": post.date_local.isoformat(),
-                "is_video": post.is_video,
-                "shortcode": shortcode
-            }
+        return {
+            "success": True,
+            "media_path": output_path,
+            **metadata
+        }
 
     except instaloader.exceptions.ConnectionException as e:
         return {
@@ -136,6 +232,7 @@ def download_instagram_media(url, output_dir):
             "caption": None
         }
     except instaloader.exceptions.LoginRequiredException as e:
+        record_login_refusal()
         return {
             "success": False,
             "error": f"Login required: {str(e)}. This content may require authentication.",
@@ -150,12 +247,43 @@ def download_instagram_media(url, output_dir):
             "caption": None
         }
 
+def handle(request):
+    """
+    Handle a single worker request.
+
+    Args:
+        request (dict): The request, containing the "url" of the Instagram post
+            and the "output_dir" to save the downloaded media to.
+
+    Returns:
+        dict: The result of download_instagram_media for the requested URL.
+    """
+    url = request.get("url")
+    output_dir = request.get("output_dir")
+    if not url or not output_dir:
+        return {
+            "success": False,
+            "error": "Request must contain 'url' and 'output_dir'",
+            "media_path": None,
+            "caption": None
+        }
+
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+
+    return download_instagram_media(url, output_dir)
+
 if __name__ == "__main__":
+    # Run as a long-lived worker reading requests from stdin
+    if len(sys.argv) == 2 and sys.argv[1] == "--serve":
+        serve(handle)
+        sys.exit(0)
+
     # Check if URL and output directory were provided
     if len(sys.argv) < 3:
         print(json.dumps({
             "success": False,
-            "error": "Usage: python insta_media_downloader.py <instagram_url> <output_directory>"
+            "error": "Usage: python insta_media_downloader.py <instagram_url> <output_directory> | --serve"
         }))
         sys.exit(1)
 
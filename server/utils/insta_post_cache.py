@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Instagram Post Metadata Cache
+This module caches the caption and metadata of Instagram posts on disk, so that
+posts processed again within the TTL don't have to be fetched from Instagram.
+"""
+
+import sys
+import os
+import json
+import time
+import sqlite3
+import functools
+
+# Location of the cache database
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "reels2transcript")
+CACHE_FILE = os.path.join(CACHE_DIR, "posts.sqlite3")
+
+# How long cached posts stay valid (in seconds)
+CACHE_TTL = 24 * 60 * 60
+
+@functools.lru_cache(maxsize=1)
+def get_connection():
+    """
+    Open the cache database, creating it if needed.
+
+    Returns:
+        sqlite3.Connection: The cache database connection, in autocommit mode.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    connection = sqlite3.connect(CACHE_FILE, isolation_level=None, timeout=10)
+    # WAL lets several worker processes read and write the cache concurrently
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute(
+        "CREATE TABLE IF NOT EXISTS posts (shortcode TEXT PRIMARY KEY, json BLOB, fetched_at INTEGER)"
+    )
+    return connection
+
+def get_cached_post(shortcode):
+    """
+    Get the cached metadata of a post.
+
+    Args:
+        shortcode (str): The shortcode of the post.
+
+    Returns:
+        dict: The cached metadata, or None if the post isn't cached or has expired.
+    """
+    try:
+        row = get_connection().execute(
+            "SELECT json FROM posts WHERE shortcode = ? AND fetched_at > ?",
+            (shortcode, int(time.time()) - CACHE_TTL)
+        ).fetchone()
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not read post cache: {str(e)}", file=sys.stderr)
+        return None
+
+    return json.loads(row[0]) if row else None
+
+def cache_post(shortcode, metadata):
+    """
+    Cache the metadata of a post.
+
+    Args:
+        shortcode (str): The shortcode of the post.
+        metadata (dict): The caption and other metadata of the post.
+    """
+    try:
+        get_connection().execute(
+            "INSERT OR REPLACE INTO posts (shortcode, json, fetched_at) VALUES (?, ?, ?)",
+            (shortcode, json.dumps(metadata), int(time.time()))
+        )
+    except (sqlite3.Error, OSError) as e:
+        print(f"Could not write post cache: {str(e)}", file=sys.stderr)
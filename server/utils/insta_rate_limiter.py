@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Rate Limiter for Instagram Requests
+This module provides a token bucket rate limiter that adapts to the rate limit
+headers sent by Instagram, and persists its state so that new worker runs don't
+start with a full bucket.
+"""
+
+import sys
+import os
+import json
+import time
+import atexit
+import asyncio
+import threading
+import functools
+from urllib.parse import urlparse
+from instaloader import instaloadercontext
+
+# File used to persist rate limiter state between runs
+RATE_STATE_FILE = os.path.join(os.path.expanduser("~"), ".instaloader", "rate_state.json")
+
+# Hosts whose requests count against Instagram's rate limits
+RATE_LIMITED_HOSTS = ("www.instagram.com", "i.instagram.com")
+
+# Default bucket size and refill rate (tokens per second)
+DEFAULT_CAPACITY = 10
+DEFAULT_REFILL_RATE = 0.5
+
+# Minimum time between saves of the state after taking tokens (in seconds)
+STATE_SAVE_INTERVAL = 5
+
+class RateLimiter:
+    """
+    Token bucket rate limiter for a single host.
+
+    Each request takes one token. Tokens refill at refill_rate per second up
+    to capacity. A Retry-After or exhausted X-RateLimit-Remaining header empties
+    the bucket and defers the next request accordingly.
+    """
+
+    def __init__(self, host, capacity=DEFAULT_CAPACITY, refill_rate=DEFAULT_REFILL_RATE, state_file=RATE_STATE_FILE):
+        self.host = host
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.state_file = state_file
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self.next_allowed = self.last_refill
+        self.last_saved = None
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Restore the state saved by a previous run, if any."""
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f).get(self.host)
+        except (OSError, ValueError):
+            return
+
+        if not state:
+            return
+
+        # Saved times are wall-clock; convert them to this process's monotonic clock
+        elapsed = max(0.0, time.time() - state["updated_at"])
+        self.tokens = min(self.capacity, state["tokens"] + elapsed * self.refill_rate)
+        self.next_allowed = self.last_refill + max(0.0, state["next_allowed"] - time.time())
+
+    def save(self):
+        """Persist the current state for the next run."""
+        try:
+            with open(self.state_file) as f:
+                states = json.load(f)
+        except (OSError, ValueError):
+            states = {}
+
+        now = time.monotonic()
+        self.last_saved = now
+        states[self.host] = {
+            "tokens": self.tokens,
+            "updated_at": time.time() - (now - self.last_refill),
+            "next_allowed": time.time() + max(0.0, self.next_allowed - now)
+        }
+
+        try:
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+            temp_file = f"{self.state_file}.{os.getpid()}.tmp"
+            with open(temp_file, "w") as f:
+                json.dump(states, f)
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            print(f"Could not save rate limiter state: {str(e)}", file=sys.stderr)
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+        self.last_refill = now
+
+    def _reserve(self):
+        """
+        Take a token, returning how long the caller must wait before using it.
+
+        Returns:
+            float: Delay in seconds (0 if a token is available now).
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            delay = max(0.0, self.next_allowed - now)
+            if self.tokens < 1:
+                delay = max(delay, (1 - self.tokens) / self.refill_rate)
+
+            self.tokens -= 1
+            return delay
+
+    def _save_throttled(self):
+        """Save the state, unless it was saved less than STATE_SAVE_INTERVAL ago."""
+        if self.last_saved is None or time.monotonic() - self.last_saved >= STATE_SAVE_INTERVAL:
+            self.save()
+
+    def acquire(self):
+        """Block until a request may be made."""
+        delay = self._reserve()
+        self._save_throttled()
+        if delay > 0:
+            print(f"Rate limiting: waiting {delay:.2f} seconds before requesting {self.host}", file=sys.stderr)
+            time.sleep(delay)
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a request may be made."""
+        delay = self._reserve()
+        self._save_throttled()
+        if delay > 0:
+            print(f"Rate limiting: waiting {delay:.2f} seconds before requesting {self.host}", file=sys.stderr)
+            await asyncio.sleep(delay)
+
+    def update_from_headers(self, headers):
+        """
+        Adapt to the rate limit headers of a response.
+
+        Args:
+            headers (Mapping): Response headers.
+        """
+        retry_after = headers.get("Retry-After")
+        remaining = headers.get("X-RateLimit-Remaining")
+        if retry_after is None and remaining is None:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if remaining is not None:
+                try:
+                    self.tokens = min(self.tokens, float(remaining))
+                except ValueError:
+                    pass
+
+            if retry_after is not None:
+                try:
+                    self.tokens = 0.0
+                    self.next_allowed = max(self.next_allowed, now + int(retry_after))
+                except ValueError:
+                    pass
+
+        self.save()
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(host):
+    """
+    Get the shared rate limiter for a host.
+
+    Args:
+        host (str): The host name.
+
+    Returns:
+        RateLimiter: The rate limiter for the host, or None if the host isn't rate limited.
+    """
+    if host not in RATE_LIMITED_HOSTS:
+        return None
+
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(host)
+            # Save the tokens taken since the last throttled save
+            atexit.register(_limiters[host].save)
+        return _limiters[host]
+
+def with_rate_limit(get_json):
+    """
+    Wrap an InstaloaderContext.get_json so every call first takes a token.
+
+    Args:
+        get_json (callable): The bound get_json method.
+
+    Returns:
+        callable: The rate limited get_json.
+    """
+    @functools.wraps(get_json)
+    def rate_limited_get_json(path, params, host="www.instagram.com", *args, **kwargs):
+        limiter = get_limiter(host)
+        if limiter:
+            limiter.acquire()
+        return get_json(path, params, host, *args, **kwargs)
+
+    return rate_limited_get_json
+
+def with_session_hooks(copy_session):
+    """
+    Wrap Instaloader's copy_session so copied sessions keep their hooks.
+
+    Instaloader runs every GraphQL query on a fresh copy of its session, and
+    the copy doesn't carry over the original's hooks.
+
+    Args:
+        copy_session (callable): instaloader.instaloadercontext.copy_session.
+
+    Returns:
+        callable: The wrapped copy_session.
+    """
+    @functools.wraps(copy_session)
+    def copy_session_with_hooks(session, *args, **kwargs):
+        new_session = copy_session(session, *args, **kwargs)
+        for event, hooks in session.hooks.items():
+            new_hooks = new_session.hooks.setdefault(event, [])
+            new_hooks.extend(hook for hook in hooks if hook not in new_hooks)
+        return new_session
+
+    copy_session_with_hooks.keeps_hooks = True
+    return copy_session_with_hooks
+
+def install_rate_limiter(loader):
+    """
+    Rate limit the requests made by an Instaloader instance.
+
+    Wraps the context's get_json so every GraphQL/API call first takes a token,
+    and adds a response hook to the session so the limiter sees Instagram's
+    rate limit headers. The hook is also carried over to the session copies
+    Instaloader makes for GraphQL queries. Must be called after any session is
+    loaded, since loading a session replaces the underlying requests session.
+
+    Args:
+        loader (instaloader.Instaloader): The Instaloader instance.
+    """
+    context = loader.context
+
+    def update_limiter(response, *args, **kwargs):
+        limiter = get_limiter(urlparse(response.url).hostname)
+        if limiter:
+            limiter.update_from_headers(response.headers)
+
+    context.get_json = with_rate_limit(context.get_json)
+    context._session.hooks["response"].append(update_limiter)
+
+    # graphql_query looks copy_session up in its module each time it runs
+    if not getattr(instaloadercontext.copy_session, "keeps_hooks", False):
+        instaloadercontext.copy_session = with_session_hooks(instaloadercontext.copy_session)
@@ -4,11 +4,7 @@ import path from 'path';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
 import { instagramGetUrl } from 'instagram-url-direct';
-import { exec } from 'child_process';
-import { promisify } from 'util';
-
-// Promisify exec for async/await usage
-const execPromise = promisify(exec);
+import { PythonWorker } from './pythonWorker.js';
 
 // Get current file path (ES modules)
 const __filename = fileURLToPath(import.meta.url);
@@ -18,6 +14,11 @@ const __dirname = dirname(__filename);
 const CAPTION_EXTRACTOR_SCRIPT = path.join(__dirname, 'insta_caption_extractor.py');
 const MEDIA_DOWNLOADER_SCRIPT = path.join(__dirname, 'insta_media_downloader.py');
 
+// Long-lived Python workers, so Instaloader and the session are loaded once
+// instead of once per URL
+const mediaDownloaderWorker = new PythonWorker(MEDIA_DOWNLOADER_SCRIPT, 'Instaloader media downloader');
+const captionExtractorWorker = new PythonWorker(CAPTION_EXTRACTOR_SCRIPT, 'Instaloader caption extractor');
+
 // Create temp directory if it doesn't exist
 const tempDir = path.join(__dirname, '../../temp');
 if (!fs.existsSync(tempDir)) {
@@ -183,8 +184,9 @@ const fallbackToSampleVideo = (url) => {
   const filename = `reel_${urlHash}.mp4`;
   const filePath = path.join(tempDir, filename);
 
-  // Copy the sample video to the temp directory
-  fs.copyFileSync(sampleVideoPath, filePath);
+  // Copy the sample video to the temp directory, as a copy-on-write clone
+  // where the filesystem supports it (falls back to a regular copy otherwise)
+  fs.copyFileSync(sampleVideoPath, filePath, fs.constants.COPYFILE_FICLONE);
 
   // Verify the file was copied correctly
   if (!fs.existsSync(filePath)) {
@@ -217,16 +219,8 @@ const downloadMediaWithInstaloader = async (url) => {
   try {
     console.log(`Downloading media with Instaloader from: ${url}`);
 
-    // Run the Python script to download the media
-    const { stdout, stderr } = await execPromise(`python3 "${MEDIA_DOWNLOADER_SCRIPT}" "${url}" "${tempDir}"`);
-
-    if (stderr) {
-      // Log stderr but don't treat it as an error since Python scripts often output to stderr
-      console.log(`Debug output from Instaloader media downloader: ${stderr}`);
-    }
-
-    // Parse the JSON output from the Python script
-    const result = JSON.parse(stdout);
+    // Ask the Python worker to download the media
+    const result = await mediaDownloaderWorker.request({ url, output_dir: tempDir });
 
     if (!result.success) {
       // Check for specific error types
@@ -379,16 +373,8 @@ const extractCaptionWithInstaloader = async (url) => {
     try {
       console.log(`Extracting caption with Instaloader from: ${url} (attempt ${retryCount + 1}/${MAX_RETRIES})`);
 
-      // Run the Python script to extract the caption
-      const { stdout, stderr } = await execPromise(`python3 "${CAPTION_EXTRACTOR_SCRIPT}" "${url}"`);
-
-      if (stderr) {
-        // Log stderr but don't treat it as an error since Python scripts often output to stderr
-        console.log(`Debug output from Instaloader caption extractor: ${stderr}`);
-      }
-
-      // Parse the JSON output from the Python script
-      const result = JSON.parse(stdout);
+      // Ask the Python worker to extract the caption
+      const result = await captionExtractorWorker.request({ url });
 
       if (!result.success) {
         // Check for specific error types
@@ -0,0 +1,195 @@
+import { spawn } from 'child_process';
+import readline from 'readline';
+
+/**
+ * Long-lived Python worker process
+ *
+ * Spawns a Python script in `--serve` mode once and sends it requests as
+ * newline-delimited JSON over stdin. Each request is tagged with an id that the
+ * script echoes back, so responses can be matched to their requests.
+ * The script handles one request at a time, so requests are queued and only
+ * written to it once the previous one has been answered.
+ * The process is started lazily on the first request and restarted if it exits.
+ */
+export class PythonWorker {
+  /**
+   * @param {string} scriptPath - Path to the Python script
+   * @param {string} name - Name used in log messages
+   * @param {Array<string>} args - Extra command line arguments for the script
+   */
+  constructor(scriptPath, name, args = []) {
+    this.scriptPath = scriptPath;
+    this.name = name;
+    this.args = args;
+    this.process = null;
+    this.nextId = 1;
+    this.queue = [];
+    this.active = null;
+  }
+
+  /**
+   * Start the Python process if it is not already running
+   */
+  start() {
+    if (this.process) {
+      return;
+    }
+
+    console.log(`Starting ${this.name} worker: python3 "${this.scriptPath}" --serve ${this.args.join(' ')}`);
+
+    const child = spawn('python3', [this.scriptPath, '--serve', ...this.args], {
+      cwd: process.cwd(),
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+    this.process = child;
+
+    // Each line on stdout is one JSON response
+    readline.createInterface({ input: child.stdout }).on('line', (line) => {
+      // Ignore output from a worker that has already been replaced
+      if (this.process === child) {
+        this.handleLine(line);
+      }
+    });
+
+    // Log stderr but don't treat it as an error since Python scripts often output to stderr
+    child.stderr.on('data', (data) => {
+      console.log(`Debug output from ${this.name}: ${data.toString().trimEnd()}`);
+    });
+
+    // Writes to a worker that is going away shouldn't crash the server
+    child.stdin.on('error', (err) => {
+      console.error(`Error writing to ${this.name} worker: ${err.message}`);
+    });
+
+    child.on('error', (err) => {
+      console.error(`${this.name} worker process error: ${err.message}`);
+      this.handleExit(child, `Process error: ${err.message}`);
+    });
+
+    child.on('exit', (code, signal) => {
+      console.warn(`${this.name} worker exited (code: ${code}, signal: ${signal})`);
+      this.handleExit(child, `Worker exited with code ${code}`);
+    });
+  }
+
+  /**
+   * Handle a line of output from the Python process
+   * @param {string} line - Line of stdout
+   */
+  handleLine(line) {
+    const trimmedLine = line.trim();
+    if (!trimmedLine) {
+      return;
+    }
+
+    let result;
+    try {
+      result = JSON.parse(trimmedLine);
+    } catch (parseError) {
+      console.log(`Non-JSON output from ${this.name}: ${trimmedLine}`);
+      return;
+    }
+
+    const request = this.active;
+    if (!request || request.id !== result.id) {
+      console.warn(`${this.name} worker returned a response for an unknown request:`, trimmedLine);
+      return;
+    }
+
+    this.active = null;
+    clearTimeout(request.timer);
+    delete result.id;
+    request.resolve(result);
+    this.sendNext();
+  }
+
+  /**
+   * Reject the request in progress when the Python process goes away
+   *
+   * Queued requests haven't been sent yet, so they go to a new process.
+   * @param {ChildProcess} child - The process that exited
+   * @param {string} message - Reason passed to the request in progress
+   */
+  handleExit(child, message) {
+    if (this.process !== child) {
+      return;
+    }
+    this.process = null;
+
+    const request = this.active;
+    if (request) {
+      this.active = null;
+      clearTimeout(request.timer);
+      request.reject(new Error(`${this.name}: ${message}`));
+    }
+    this.sendNext();
+  }
+
+  /**
+   * Write the next queued request to the Python process, if it is idle
+   */
+  sendNext() {
+    if (this.active || this.queue.length === 0) {
+      return;
+    }
+
+    this.start();
+    const request = this.queue.shift();
+    this.active = request;
+
+    // The timeout covers the time the worker spends on this request, not the time spent queued
+    if (request.timeout > 0) {
+      request.timer = setTimeout(() => this.handleTimeout(request), request.timeout);
+    }
+
+    this.process.stdin.write(`${JSON.stringify({ ...request.payload, id: request.id })}\n`);
+  }
+
+  /**
+   * Fail a request that took too long
+   * @param {Object} request - The timed out request
+   */
+  handleTimeout(request) {
+    if (this.active !== request) {
+      return;
+    }
+    this.active = null;
+    request.reject(Object.assign(new Error(`${this.name} request timed out after ${request.timeout / 1000} seconds`), { code: 'ETIMEDOUT' }));
+
+    // The worker is still busy with the timed out request, so replace it
+    // and carry on with the queue in a new process
+    const child = this.process;
+    this.process = null;
+    child.kill();
+    this.sendNext();
+  }
+
+  /**
+   * Send a request to the Python process
+   * @param {Object} payload - Request payload
+   * @param {number} timeout - Timeout in milliseconds, counted from when the worker starts on the request (0 for no timeout)
+   * @returns {Promise<Object>} - Parsed JSON response
+   */
+  request(payload, timeout = 0) {
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, payload, timeout, resolve, reject, timer: null });
+      this.sendNext();
+    });
+  }
+
+  /**
+   * Stop the Python process
+   */
+  stop() {
+    // Queued requests would otherwise start a new process
+    for (const request of this.queue.splice(0)) {
+      request.reject(new Error(`${this.name}: Worker stopped`));
+    }
+
+    const child = this.process;
+    if (child) {
+      this.handleExit(child, 'Worker stopped');
+      child.kill();
+    }
+  }
+}
@@ -3,7 +3,7 @@ import path from 'path';
 import { fileURLToPath } from 'url';
 import { dirname } from 'path';
 import { spawn } from 'child_process';
-import { exec } from 'child_process';
+import { PythonWorker } from './pythonWorker.js';
 
 // Get current file path (ES modules)
 const __filename = fileURLToPath(import.meta.url);
@@ -42,6 +42,25 @@ const getModelPath = () => {
 const PYTHON_SCRIPT_PATH = path.join(__dirname, 'vosk_transcribe.py');
 console.log(`Python script path: ${PYTHON_SCRIPT_PATH}`);
 
+// Timeout for a single transcription (in milliseconds)
+const TRANSCRIPTION_TIMEOUT = 60000;
+
+// Long-lived Python worker, so Vosk and the model are loaded once instead of
+// once per transcription. Created on first use, once a model has been found.
+let transcriberWorker = null;
+
+/**
+ * Get the Vosk transcriber worker, creating it on first use
+ * @param {string} modelPath - Model the worker preloads at startup
+ * @returns {PythonWorker} - The transcriber worker
+ */
+const getTranscriberWorker = (modelPath) => {
+  if (!transcriberWorker) {
+    transcriberWorker = new PythonWorker(PYTHON_SCRIPT_PATH, 'Vosk transcriber', ['--model', modelPath]);
+  }
+  return transcriberWorker;
+};
+
 // Maximum number of retries for transcription
 const MAX_RETRIES = 3;
 
@@ -135,118 +154,60 @@ export const transcribeAudioWithVosk = async (audioPath, options = {}) => {
  * @returns {Promise<Object>} - Transcription result
  */
 const runPythonTranscription = async (audioPath, outputPath, modelPath) => {
-  return new Promise((resolve, reject) => {
-    try {
-      // Command to run Python script
-      const cwd = process.cwd();
-      const command = `cd "${cwd}" && python3 "${PYTHON_SCRIPT_PATH}" "${audioPath}" --model "${modelPath}" --output "${outputPath}"`;
-
-      console.log(`Running command: ${command}`);
-      console.log(`Current working directory: ${cwd}`);
-
-      // Execute the command with a timeout
-      const childProcess = exec(command, { timeout: 60000 }, (error, stdout, stderr) => {
-        if (error) {
-          // Categorize the error
-          let errorType = 'UNKNOWN_ERROR';
-          let errorMessage = error.message;
-
-          if (error.code === 'ETIMEDOUT') {
-            errorType = 'TIMEOUT_ERROR';
-            errorMessage = 'Transcription process timed out after 60 seconds';
-          } else if (error.code === 'ENOENT') {
-            errorType = 'COMMAND_NOT_FOUND';
-            errorMessage = 'Python or required command not found';
-          } else if (stderr && stderr.includes('ModuleNotFoundError')) {
-            errorType = 'MODULE_ERROR';
-            errorMessage = 'Python module not found. Please install required dependencies';
-          } else if (stderr && stderr.includes('PermissionError')) {
-            errorType = 'PERMISSION_ERROR';
-            errorMessage = 'Permission denied when accessing files';
-          }
-
-          console.error(`Error executing Python script (${errorType}): ${errorMessage}`);
-          console.error(`stderr: ${stderr}`);
-
-          return reject({
-            code: errorType,
-            message: errorMessage,
-            details: stderr
-          });
-        }
-
-        // Log stderr as debug information
-        if (stderr) {
-          console.log(`Python script logs: ${stderr}`);
-        }
-
-        try {
-          // Parse the output - stdout should now contain only the JSON result
-          const trimmedOutput = stdout.trim();
-          if (!trimmedOutput) {
-            console.warn('Empty output from Python script');
-            return reject({
-              code: 'EMPTY_OUTPUT',
-              message: 'Python script returned empty output',
-              details: stderr
-            });
-          }
-
-          const result = JSON.parse(trimmedOutput);
+  let result;
+  try {
+    console.log(`Sending transcription request to Vosk worker: ${audioPath}`);
+
+    // Ask the Python worker to transcribe the audio
+    result = await getTranscriberWorker(modelPath).request({
+      audio_path: audioPath,
+      model: modelPath,
+      output_path: outputPath
+    }, TRANSCRIPTION_TIMEOUT);
+  } catch (error) {
+    // Categorize the error
+    let errorType = 'UNKNOWN_ERROR';
+    let errorMessage = error.message;
+
+    if (error.code === 'ETIMEDOUT') {
+      errorType = 'TIMEOUT_ERROR';
+      errorMessage = `Transcription process timed out after ${TRANSCRIPTION_TIMEOUT / 1000} seconds`;
+    } else if (error.message && error.message.includes('ENOENT')) {
+      errorType = 'COMMAND_NOT_FOUND';
+      errorMessage = 'Python or required command not found';
+    }
 
-          console.log('Parsed JSON result from Python script:', JSON.stringify(result, null, 2));
+    console.error(`Error running Python script (${errorType}): ${errorMessage}`);
 
-          // Check for errors
-          if (result.error) {
-            const errorMessage = `Python script error: ${result.error}`;
-            console.error(errorMessage);
-            return reject({
-              code: 'PYTHON_SCRIPT_ERROR',
-              message: errorMessage,
-              details: result.error
-            });
-          }
+    throw {
+      code: errorType,
+      message: errorMessage,
+      details: error.message
+    };
+  }
 
-          // Check if result is empty
-          if (!result.text && (!result.result || result.result.length === 0)) {
-            console.warn('Transcription result is empty. Audio might not contain speech.');
+  console.log('Parsed JSON result from Python script:', JSON.stringify(result, null, 2));
 
-            // Ensure result has a text property even if empty
-            result.text = result.text || '';
-          }
+  // Check for errors
+  if (result.error) {
+    const errorMessage = `Python script error: ${result.error}`;
+    console.error(errorMessage);
+    throw {
+      code: 'PYTHON_SCRIPT_ERROR',
+      message: errorMessage,
+      details: result.error
+    };
+  }
 
-          resolve(result);
-        } catch (parseError) {
-          const errorMessage = `Error parsing Python script output: ${parseError.message}`;
-          console.error(errorMessage);
-          console.error(`stdout: ${stdout}`);
+  // Check if result is empty
+  if (!result.text && (!result.result || result.result.length === 0)) {
+    console.warn('Transcription result is empty. Audio might not contain speech.');
 
-          reject({
-            code: 'PARSE_ERROR',
-            message: errorMessage,
-            details: stdout
-          });
-        }
-      });
+    // Ensure result has a text property even if empty
+    result.text = result.text || '';
+  }
 
-      // Handle process errors
-      childProcess.on('error', (err) => {
-        console.error(`Process error: ${err.message}`);
-        reject({
-          code: 'PROCESS_ERROR',
-          message: `Process error: ${err.message}`,
-          details: err
-        });
-      });
-    } catch (error) {
-      console.error(`Error running Python script: ${error.message}`);
-      reject({
-        code: 'EXECUTION_ERROR',
-        message: `Error running Python script: ${error.message}`,
-        details: error
-      });
-    }
-  });
+  return result;
 };
 
 /**
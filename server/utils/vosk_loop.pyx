@@ -0,0 +1,42 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled Audio Feed Loop for Vosk
+This module is an optional compiled version of the loop in vosk_transcribe.py
+that feeds PCM audio to a recognizer block by block. vosk_transcribe.py uses
+its own Python loop when the module isn't built. Build it in place with:
+
+    pip install cython
+    cythonize -i server/utils/vosk_loop.pyx
+"""
+
+from cpython.bytes cimport PyBytes_FromStringAndSize
+
+def feed_waveform(rec, const unsigned char[::1] data, Py_ssize_t start, Py_ssize_t end, Py_ssize_t block_size):
+    """
+    Feed a byte range of PCM audio to a recognizer in blocks
+
+    Args:
+        rec (KaldiRecognizer): Vosk recognizer
+        data (buffer): Audio file contents, such as an mmap of the file
+        start (int): Offset of the first byte of samples to feed
+        end (int): Offset just past the last byte to feed
+        block_size (int): Bytes fed to the recognizer at a time
+
+    Returns:
+        list: Result() of the recognizer for each utterance it completed, as JSON strings
+    """
+    cdef list results = []
+    cdef Py_ssize_t offset = start
+    cdef Py_ssize_t length
+    accept_waveform = rec.AcceptWaveform
+    get_result = rec.Result
+
+    end = min(end, data.shape[0])
+    while offset < end:
+        length = min(block_size, end - offset)
+        # Vosk only accepts bytes, so copy the block straight out of the buffer
+        if accept_waveform(PyBytes_FromStringAndSize(<const char *>&data[offset], length)):
+            results.append(get_result())
+        offset += length
+
+    return results
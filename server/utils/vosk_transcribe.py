@@ -3,15 +3,254 @@
 import sys
 import os
 import json
-import wave
+import io
 import argparse
+import logging
 import time
+import struct
+import mmap
 import traceback
-from vosk import Model, KaldiRecognizer, SetLogLevel
+import functools
+import threading
+import collections
+import operator
+import heapq
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Each recognizer decodes on a single thread; several run side by side instead
+# (see PARALLEL_WORKERS). Must be set before Vosk loads its native library.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+os.environ.setdefault("MKL_NUM_THREADS", "1")
+
+try:
+    # Only needed to compress saved transcriptions
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    # Only needed to skip silence with --vad
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+try:
+    # orjson parses Vosk's results considerably faster than the json module
+    import orjson
+except ImportError:
+    orjson = None
+
+json_loads = orjson.loads if orjson else json.loads
+
+def json_dumps(obj, pretty=False):
+    """
+    Serialize an object to JSON, using orjson when available
+
+    Args:
+        obj: Object to serialize
+        pretty (bool, optional): Indent the output. Defaults to False.
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, indent=2).encode()
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+def write_json_line(obj):
+    """
+    Write an object to stdout as a single line of JSON
+
+    Args:
+        obj: Object to write
+    """
+    sys.stdout.buffer.write(json_dumps(obj) + b"\n")
+    sys.stdout.buffer.flush()
+
+# Number of audio frames fed to the recognizer at a time (2 s at 16 kHz), so
+# Vosk returns and JSON is parsed less often. Can be overridden with VOSK_CHUNK_FRAMES.
+CHUNK_FRAMES = int(os.environ.get("VOSK_CHUNK_FRAMES", 32000))
+
+# Frames fed at a time in streaming mode (0.25 s at 16 kHz), as for live audio
+STREAMING_CHUNK_FRAMES = 4000
+
+# Audio longer than this is split into chunks decoded in parallel (in seconds)
+PARALLEL_MIN_DURATION = 60
+
+# Length of each parallel chunk, and of the extra audio decoded on either
+# side of it so words crossing a chunk boundary are recognized whole (in seconds)
+PARALLEL_CHUNK_DURATION = 30
+PARALLEL_CHUNK_OVERLAP = 1
 
-# Function to print to stderr for logging
-def log(message):
-    print(message, file=sys.stderr, flush=True)
+# Voice activity detection: aggressiveness (0-3) and window length (10, 20 or
+# 30 ms) of webrtcvad, pauses bridged within a speech segment, the shortest
+# speech kept, and the audio kept either side of a segment so words aren't
+# clipped (in seconds). The padding must stay under half the bridged gap.
+VAD_AGGRESSIVENESS = 2
+VAD_WINDOW_MS = 30
+VAD_MAX_GAP = 0.3
+VAD_MIN_SPEECH = 0.2
+VAD_PADDING = 0.1
+
+# Number of chunks decoded at the same time. Each worker uses one thread, so
+# workers times OMP_NUM_THREADS should not exceed the number of physical cores;
+# the default assumes two hardware threads per core.
+PARALLEL_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+
+# Progress is logged to stderr; stdout only carries the JSON results
+logger = logging.getLogger("vosk_transcribe")
+
+# Size of the reads used to pull model files into the page cache
+MODEL_PREFAULT_BLOCK_SIZE = 1 << 20
+
+# Serializes model loading so concurrent callers don't each load the same model
+_model_lock = threading.Lock()
+
+def prefetch_model(model_path):
+    """
+    Ask the kernel to start reading a model's files into the page cache
+
+    The reads happen in the background, so by the time Vosk opens the files
+    they are largely cached. Does nothing where posix_fadvise isn't available.
+
+    Args:
+        model_path (str): Path to Vosk model
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    for directory, _, files in os.walk(model_path):
+        for name in files:
+            try:
+                fd = os.open(os.path.join(directory, name), os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+def prefault_model(model_path):
+    """
+    Read a model's files through once so they are in the page cache
+
+    Unlike prefetch_model this blocks until the files have been read, so it
+    is meant to run on a background thread (see start_prefault_model).
+
+    Args:
+        model_path (str): Path to Vosk model
+    """
+    prefetch_model(model_path)
+
+    buffer = bytearray(MODEL_PREFAULT_BLOCK_SIZE)
+    for directory, _, files in os.walk(model_path):
+        for name in files:
+            try:
+                with open(os.path.join(directory, name), "rb", buffering=0) as f:
+                    while f.readinto(buffer):
+                        pass
+            except OSError:
+                continue
+
+def start_prefault_model(model_path):
+    """
+    Start reading a model's files into the page cache on a background thread
+
+    Lets the disk reads overlap with whatever the process does until Vosk
+    loads the model, such as importing Vosk or waiting for the first request.
+
+    Args:
+        model_path (str): Path to Vosk model
+
+    Returns:
+        threading.Thread: The thread reading the files
+    """
+    thread = threading.Thread(target=prefault_model, args=(model_path,), name="prefault-model", daemon=True)
+    thread.start()
+    return thread
+
+@functools.lru_cache(maxsize=1)
+def _vosk():
+    """
+    Import Vosk on first use
+
+    Importing Vosk loads its native library, which the checks and the command
+    line handling don't need, so the import waits until a model is loaded.
+
+    Returns:
+        module: The vosk module
+    """
+    import vosk
+
+    # Set log level to suppress debug messages
+    vosk.SetLogLevel(-1)
+    return vosk
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_path):
+    prefetch_model(model_path)
+    return _vosk().Model(model_path)
+
+def get_model(model_path):
+    """
+    Load a Vosk model, reusing it if it was already loaded by this process
+
+    Each distinct model path stays resident for the lifetime of the process,
+    so a worker serving both the small and the large model keeps both in memory.
+
+    Args:
+        model_path (str): Path to Vosk model
+
+    Returns:
+        Model: The loaded Vosk model
+    """
+    with _model_lock:
+        return _load_model(model_path)
+
+@functools.lru_cache(maxsize=1)
+def get_batch_model(model_path):
+    """
+    Load a Vosk model for GPU batch decoding, reusing it if already loaded
+
+    Args:
+        model_path (str): Path to Vosk model
+
+    Returns:
+        BatchModel: The loaded Vosk batch model
+    """
+    vosk = _vosk()
+    vosk.GpuInit()
+    return vosk.BatchModel(model_path)
+
+def warm_model(model_path):
+    """
+    Load a model ahead of the first transcription that uses it
+
+    Args:
+        model_path (str): Path to Vosk model
+
+    Returns:
+        tuple: (bool, str) - Success status and error message if any
+    """
+    model_ok, model_error = check_model(model_path)
+    if not model_ok:
+        return False, model_error
+
+    logger.info("Preloading model from %s...", model_path)
+    start_time = time.perf_counter()
+    try:
+        get_model(model_path)
+    except Exception as e:
+        return False, str(e)
+
+    logger.info("Model preloaded in %.2f seconds", time.perf_counter() - start_time)
+    return True, ""
 
 def check_dependencies():
     """
@@ -21,7 +260,7 @@ def check_dependencies():
         tuple: (bool, str) - Success status and error message if any
     """
     try:
-        import vosk
+        _vosk()
         return True, ""
     except ImportError:
         return False, "Vosk module not found. Please install it with 'pip install vosk'"
@@ -30,45 +269,398 @@ def check_audio_file(audio_path):
     """
     Check if audio file exists and is valid
 
+    The header is read once, and returned so the caller doesn't read it again.
+
     Args:
         audio_path (str): Path to audio file
 
     Returns:
-        tuple: (bool, str) - Success status and error message if any
+        tuple: (bool, str, WavInfo) - Success status, error message if any, and
+            the audio format (None if the file isn't valid)
     """
     if not os.path.exists(audio_path):
-        return False, f"Audio file {audio_path} not found"
+        return False, f"Audio file {audio_path} not found", None
 
     try:
-        with wave.open(audio_path, "rb") as wf:
-            # Check audio format
-            if wf.getnchannels() != 1 or wf.getsampwidth() != 2 or wf.getcomptype() != "NONE":
-                return False, "Audio file must be WAV format mono PCM"
-        return True, ""
+        wav = read_wav_header(audio_path)
     except Exception as e:
-        return False, f"Invalid audio file: {str(e)}"
+        return False, f"Invalid audio file: {str(e)}", None
+
+    # Check audio format
+    if wav.format_tag != WAVE_FORMAT_PCM or wav.channels != 1 or wav.sample_width != 2:
+        return False, "Audio file must be WAV format mono PCM", None
+
+    return True, "", wav
+
+# Files every Vosk model directory contains
+MODEL_REQUIRED_FILES = ("am/final.mdl", "conf/mfcc.conf", "conf/model.conf")
+
+# Models already found to be valid by this process
+_valid_models = set()
 
 def check_model(model_path):
     """
     Check if model exists and is valid
 
+    A model that passed the check isn't looked at on disk again. Failures
+    aren't remembered, so a model installed while the process runs is found.
+
     Args:
         model_path (str): Path to Vosk model
 
     Returns:
         tuple: (bool, str) - Success status and error message if any
     """
-    if not os.path.exists(model_path):
+    if model_path in _valid_models:
+        return True, ""
+
+    if not os.path.isdir(model_path):
         return False, f"Model {model_path} not found"
 
-    required_files = ["am/final.mdl", "conf/mfcc.conf", "conf/model.conf"]
-    for file in required_files:
-        if not os.path.exists(os.path.join(model_path, file)):
-            return False, f"Invalid model: {file} not found in model directory"
+    missing = [file for file in MODEL_REQUIRED_FILES if not os.path.isfile(os.path.join(model_path, file))]
+    if missing:
+        return False, f"Invalid model: {missing[0]} not found in model directory"
 
+    _valid_models.add(model_path)
     return True, ""
 
-def transcribe_audio(audio_path, model_path, output_path=None):
+# Format tag of uncompressed PCM audio in a WAV file header
+WAVE_FORMAT_PCM = 1
+
+# Audio format details read from a WAV file header
+WavInfo = collections.namedtuple("WavInfo", [
+    "format_tag", "channels", "framerate", "sample_width", "data_offset", "data_length"
+])
+
+def read_wav_header(audio_path):
+    """
+    Read the format and the location of the PCM samples from a WAV file header
+
+    Args:
+        audio_path (str): Path to audio file
+
+    Returns:
+        WavInfo: Audio format, and the offset and length in bytes of the samples
+    """
+    with open(audio_path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:] != b"WAVE":
+            raise ValueError("File is not a WAV file")
+
+        # Walk the chunks, reading the fmt chunk, until the data chunk
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError("WAV file has no data chunk")
+
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"fmt ":
+                format_tag, channels, framerate, _, _, bits = struct.unpack("<HHIIHH", f.read(16))
+                fmt = (format_tag, channels, framerate, (bits + 7) // 8)
+                chunk_size -= 16
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV file has no fmt chunk")
+                # Streamed and truncated files claim more data than they hold
+                data_length = min(chunk_size, os.fstat(f.fileno()).st_size - f.tell())
+                frame_size = fmt[1] * fmt[3]
+                return WavInfo(*fmt, f.tell(), data_length - data_length % frame_size)
+
+            # Chunks are padded to an even number of bytes
+            f.seek(chunk_size + (chunk_size & 1), 1)
+
+def _feed_waveform(rec, data, start, end, block_size):
+    """
+    Feed a byte range of PCM audio to a recognizer in blocks
+
+    The compiled version in vosk_loop.pyx is used instead when it is built.
+
+    Args:
+        rec (KaldiRecognizer): Vosk recognizer
+        data (mmap.mmap): Audio file contents
+        start (int): Offset of the first byte of samples to feed
+        end (int): Offset just past the last byte to feed
+        block_size (int): Bytes fed to the recognizer at a time
+
+    Returns:
+        list: Result() of the recognizer for each utterance it completed, as JSON strings
+    """
+    results = []
+    append_result = results.append
+    accept_waveform = rec.AcceptWaveform
+    get_result = rec.Result
+
+    for offset in range(start, end, block_size):
+        # Vosk only accepts bytes, so each block is still sliced into a bytes object
+        if accept_waveform(data[offset:min(offset + block_size, end)]):
+            append_result(get_result())
+
+    return results
+
+try:
+    # Optional compiled feed loop, built from vosk_loop.pyx
+    from vosk_loop import feed_waveform
+except ImportError:
+    feed_waveform = _feed_waveform
+
+def decode_pcm(model, audio_path, wav, start, end, include_words=True, chunk_frames=CHUNK_FRAMES):
+    """
+    Run a recognizer over a byte range of the PCM samples in a WAV file
+
+    Args:
+        model (Model): Vosk model
+        audio_path (str): Path to audio file
+        wav (WavInfo): Audio format and location of the samples
+        start (int): File offset of the first byte of samples to decode
+        end (int): File offset just past the last byte to decode
+        include_words (bool, optional): Have Vosk report word segments. Defaults to True.
+        chunk_frames (int, optional): Frames fed to the recognizer at a time. Defaults to CHUNK_FRAMES.
+
+    Returns:
+        list: Vosk results, with times relative to the start of the range
+    """
+    # Create recognizer
+    rec = _vosk().KaldiRecognizer(model, wav.framerate)
+    rec.SetWords(include_words)
+
+    block_size = chunk_frames * wav.channels * wav.sample_width
+
+    # Map the file and slice the PCM samples straight out of the page cache,
+    # rather than making a read call per block
+    with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        # Never read or advise past the end of the mapping
+        end = min(end, len(mm))
+
+        # The range is read once front to back, so have the kernel read ahead
+        # of it and not keep it cached for longer than needed
+        if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL") and start < end:
+            page_start = start - start % mmap.PAGESIZE
+            mm.madvise(mmap.MADV_SEQUENTIAL, page_start, end - page_start)
+            mm.madvise(mmap.MADV_WILLNEED, page_start, end - page_start)
+
+        results = feed_waveform(rec, mm, start, end, block_size)
+
+    # Get final result
+    results.append(rec.FinalResult())
+
+    # Vosk hands over each utterance only once, so every result is needed.
+    # Parse them all in a single call rather than one at a time.
+    return json_loads("[" + ",".join(results) + "]")
+
+def decode_chunk(audio_path, model_path, wav, chunk_start, chunk_end, range_start=0, range_end=None):
+    """
+    Decode one chunk of a long audio file (runs in a worker thread or process)
+
+    The chunk is decoded with PARALLEL_CHUNK_OVERLAP seconds of extra audio on
+    either side, as far as the range of audio it belongs to allows, and only
+    the words starting inside the chunk itself are kept, so every word is
+    returned by exactly one chunk.
+
+    Args:
+        audio_path (str): Path to audio file
+        model_path (str): Path to Vosk model
+        wav (WavInfo): Audio format and location of the samples
+        chunk_start (int): First frame of the chunk
+        chunk_end (int): Frame just past the end of the chunk
+        range_start (int, optional): First frame of the range of audio the chunk is part of. Defaults to 0.
+        range_end (int, optional): Frame just past the end of that range. Defaults to the end of the audio.
+
+    Returns:
+        dict: Vosk result for the chunk, with times relative to the start of the audio
+    """
+    framerate = wav.framerate
+    frame_size = wav.channels * wav.sample_width
+    total_frames = wav.data_length // frame_size
+
+    overlap = PARALLEL_CHUNK_OVERLAP * framerate
+    decode_start = max(range_start, chunk_start - overlap)
+    decode_end = min(total_frames if range_end is None else range_end, chunk_end + overlap)
+
+    results = decode_pcm(get_model(model_path), audio_path, wav,
+                         wav.data_offset + decode_start * frame_size,
+                         wav.data_offset + decode_end * frame_size)
+
+    offset = decode_start / framerate
+    keep_from = chunk_start / framerate
+    keep_until = chunk_end / framerate
+
+    words = []
+    for r in results:
+        for word in r.get("result", []):
+            word["start"] += offset
+            word["end"] += offset
+            if keep_from <= word["start"] < keep_until:
+                words.append(word)
+
+    return {"text": " ".join(word["word"] for word in words), "result": words}
+
+def vad_split(audio_path, wav):
+    """
+    Find the parts of an audio file that contain speech
+
+    Runs webrtcvad over the audio, bridging short pauses, dropping blips
+    shorter than VAD_MIN_SPEECH and padding each part by VAD_PADDING.
+
+    Args:
+        audio_path (str): Path to audio file
+        wav (WavInfo): Audio format and location of the samples
+
+    Returns:
+        list: (start, end) frames of each part containing speech, in audio order
+
+    Raises:
+        ValueError: If webrtcvad doesn't support the audio's framerate
+    """
+    if wav.framerate not in (8000, 16000, 32000, 48000):
+        raise ValueError(f"Voice activity detection doesn't support {wav.framerate} Hz audio")
+
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    is_speech = vad.is_speech
+    framerate = wav.framerate
+    frame_size = wav.channels * wav.sample_width
+    total_frames = wav.data_length // frame_size
+    window_frames = framerate * VAD_WINDOW_MS // 1000
+    window_size = window_frames * frame_size
+    max_gap = int(VAD_MAX_GAP * framerate)
+
+    segments = []
+    with open(audio_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for start in range(0, total_frames - window_frames + 1, window_frames):
+            offset = wav.data_offset + start * frame_size
+            if not is_speech(mm[offset:offset + window_size], framerate):
+                continue
+            if segments and start - segments[-1][1] <= max_gap:
+                segments[-1][1] = start + window_frames
+            else:
+                segments.append([start, start + window_frames])
+
+    min_speech = int(VAD_MIN_SPEECH * framerate)
+    padding = int(VAD_PADDING * framerate)
+    return [(max(0, start - padding), min(total_frames, end + padding))
+            for start, end in segments if end - start >= min_speech]
+
+def init_decode_process(cpu_queue):
+    """
+    Set up a worker process for decode_parallel
+
+    Pins the process to a CPU of its own, taken from the queue, so workers
+    don't migrate between cores or share one. Left unpinned if there are more
+    workers than CPUs, or where CPU affinity isn't supported.
+
+    Args:
+        cpu_queue (multiprocessing.Queue): CPUs not yet taken by a worker
+    """
+    if hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu_queue.get_nowait()})
+        except (queue.Empty, OSError):
+            pass
+
+def decode_parallel(audio_path, model_path, wav, workers=PARALLEL_WORKERS, processes=False, ranges=None):
+    """
+    Decode a long audio file in chunks spread over a pool of workers
+
+    By default the workers are threads, each running its own recognizer on the
+    one model already loaded by this process. Vosk releases the GIL while it
+    decodes, so the threads run in parallel without a copy of the model per
+    worker. Worker processes can be used instead should that not hold.
+
+    Args:
+        audio_path (str): Path to audio file
+        model_path (str): Path to Vosk model
+        wav (WavInfo): Audio format and location of the samples
+        workers (int, optional): Number of chunks decoded at the same time. Defaults to PARALLEL_WORKERS.
+        processes (bool, optional): Decode in worker processes rather than threads. Defaults to False.
+        ranges (list, optional): (start, end) frames of the parts of the audio to decode, such as
+            the speech found by vad_split. Defaults to the whole audio.
+
+    Returns:
+        list: Vosk results, one per chunk, in audio order
+    """
+    if ranges is None:
+        ranges = [(0, wav.data_length // (wav.channels * wav.sample_width))]
+
+    chunk_frames = PARALLEL_CHUNK_DURATION * wav.framerate
+    chunks = [(start, min(start + chunk_frames, range_end), range_start, range_end)
+              for range_start, range_end in ranges
+              for start in range(range_start, range_end, chunk_frames)]
+    if not chunks:
+        return []
+
+    max_workers = max(1, min(len(chunks), workers))
+    if processes:
+        # Each worker process needs its own copy of the model. Where workers are forked
+        # (the default on Linux) they inherit the one already loaded by this process.
+        logger.info("Decoding %s chunks in %s worker processes", len(chunks), max_workers)
+        cpu_queue = multiprocessing.Queue()
+        cpus = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else ()
+        for cpu in sorted(cpus):
+            cpu_queue.put(cpu)
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=init_decode_process,
+                                       initargs=(cpu_queue,))
+    else:
+        logger.info("Decoding %s chunks in %s worker threads", len(chunks), max_workers)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    with executor:
+        futures = [
+            executor.submit(decode_chunk, audio_path, model_path, wav, *chunk)
+            for chunk in chunks
+        ]
+        return [future.result() for future in futures]
+
+def merge_results(results, include_words=True):
+    """
+    Combine Vosk results into a single transcription
+
+    Args:
+        results (list): Vosk results, in audio order
+        include_words (bool, optional): Include per-word segments. Defaults to True.
+
+    Returns:
+        dict: Transcription with the combined "text" and "result" word segments
+    """
+    # Combine text and word segments in a single pass
+    text_buffer = io.StringIO()
+    segment_lists = []
+    for r in results:
+        text = r.get("text")
+        if text:
+            if text_buffer.tell():
+                text_buffer.write(" ")
+            text_buffer.write(text)
+        segments = r.get("result")
+        if segments and include_words:
+            segment_lists.append(segments)
+
+    # Each result's segments are already in order, so merge them by start time
+    # rather than sorting (Vosk always sets "start" on word segments)
+    words = list(heapq.merge(*segment_lists, key=operator.itemgetter("start")))
+
+    full_result = {"text": text_buffer.getvalue(), "result": words}
+
+    if full_result["result"]:
+        # Always construct text from segments as a backup
+        # This ensures we have text even if the recognizer didn't provide it
+        logger.debug("Constructing text from segments")
+        segments_text = " ".join([segment.get("word", "") for segment in full_result["result"]])
+
+        # If text is empty or just whitespace, use the segments text
+        if not full_result["text"] or full_result["text"].strip() == "":
+            logger.debug("Text field is empty, using text constructed from segments")
+            full_result["text"] = segments_text
+        else:
+            logger.debug("Text field has content: '%s'", full_result['text'])
+            # If the text from segments is significantly longer, use it instead
+            if len(segments_text) > len(full_result["text"]) * 1.5:
+                logger.debug("Text from segments is significantly longer, using it instead")
+                full_result["text"] = segments_text
+
+    return full_result
+
+def transcribe_audio(audio_path, model_path, output_path=None, pretty=False, include_words=True, compress=False,
+                     workers=PARALLEL_WORKERS, processes=False, streaming=False, use_vad=False):
     """
     Transcribe audio file using Vosk
 
@@ -76,6 +668,15 @@ def transcribe_audio(audio_path, model_path, output_path=None):
         audio_path (str): Path to audio file
         model_path (str): Path to Vosk model
         output_path (str, optional): Path to save transcription. Defaults to None.
+        pretty (bool, optional): Indent the saved transcription. Defaults to False.
+        include_words (bool, optional): Include per-word segments in the result. Defaults to True.
+        compress (bool, optional): Compress the saved transcription with zstd. Defaults to False.
+        workers (int, optional): Number of chunks of long audio decoded at the same time. Defaults to PARALLEL_WORKERS.
+        processes (bool, optional): Decode long audio in worker processes rather than threads. Defaults to False.
+        streaming (bool, optional): Feed the audio in small blocks through a single recognizer,
+            as for live audio. Defaults to False.
+        use_vad (bool, optional): Only decode the parts of the audio that contain speech, as
+            independent chunks. Defaults to False.
 
     Returns:
         dict: Transcription result
@@ -85,8 +686,14 @@ def transcribe_audio(audio_path, model_path, output_path=None):
     if not deps_ok:
         return {"error": deps_error, "error_type": "DEPENDENCY_ERROR"}
 
+    if use_vad and webrtcvad is None:
+        return {"error": "WebRTC VAD module not found. Please install it with 'pip install webrtcvad'", "error_type": "DEPENDENCY_ERROR"}
+
+    if compress and output_path and zstandard is None:
+        return {"error": "Zstandard module not found. Please install it with 'pip install zstandard'", "error_type": "DEPENDENCY_ERROR"}
+
     # Check audio file
-    audio_ok, audio_error = check_audio_file(audio_path)
+    audio_ok, audio_error, wav = check_audio_file(audio_path)
     if not audio_ok:
         return {"error": audio_error, "error_type": "AUDIO_FILE_ERROR"}
 
@@ -96,86 +703,43 @@ def transcribe_audio(audio_path, model_path, output_path=None):
         return {"error": model_error, "error_type": "MODEL_ERROR"}
 
     try:
-        # Set log level to suppress debug messages
-        SetLogLevel(-1)
-
-        log(f"Loading model from {model_path}...")
-        start_time = time.time()
-
-        # Load model
-        model = Model(model_path)
-
-        model_load_time = time.time() - start_time
-        log(f"Model loaded in {model_load_time:.2f} seconds")
+        logger.info("Loading model from %s...", model_path)
+        start_time = time.perf_counter()
 
-        # Open audio file
-        wf = wave.open(audio_path, "rb")
+        # Load model (cached after the first transcription in this process)
+        model = get_model(model_path)
 
-        # Get audio info
-        audio_duration = wf.getnframes() / wf.getframerate()
-        audio_channels = wf.getnchannels()
-        audio_sample_width = wf.getsampwidth()
-        audio_framerate = wf.getframerate()
+        model_load_time = time.perf_counter() - start_time
+        logger.info("Model loaded in %.2f seconds", model_load_time)
 
-        log(f"Audio duration: {audio_duration:.2f} seconds")
-        log(f"Audio channels: {audio_channels}")
-        log(f"Audio sample width: {audio_sample_width}")
-        log(f"Audio framerate: {audio_framerate} Hz")
+        # Get audio info (read from the header by check_audio_file)
+        audio_duration = wav.data_length / (wav.channels * wav.sample_width * wav.framerate)
 
-        # Create recognizer
-        rec = KaldiRecognizer(model, wf.getframerate())
-        rec.SetWords(True)
+        logger.info("Audio duration: %.2f seconds", audio_duration)
+        logger.debug("Audio channels: %s", wav.channels)
+        logger.debug("Audio sample width: %s", wav.sample_width)
+        logger.debug("Audio framerate: %s Hz", wav.framerate)
 
         # Process audio
-        log("Processing audio...")
-        transcription_start_time = time.time()
-
-        results = []
-        while True:
-            data = wf.readframes(4000)
-            if len(data) == 0:
-                break
-            if rec.AcceptWaveform(data):
-                part_result = json.loads(rec.Result())
-                results.append(part_result)
-
-        # Get final result
-        part_result = json.loads(rec.FinalResult())
-        results.append(part_result)
-
-        transcription_time = time.time() - transcription_start_time
-        log(f"Audio processed in {transcription_time:.2f} seconds")
-
-        # Combine results
-        full_result = {
-            "text": " ".join([r.get("text", "") for r in results if "text" in r]),
-            "result": []
-        }
-
-        # Combine word segments
-        for r in results:
-            if "result" in r:
-                full_result["result"].extend(r["result"])
-
-        # Sort segments by start time
-        if full_result["result"]:
-            full_result["result"].sort(key=lambda x: x.get("start", 0))
-
-            # Always construct text from segments as a backup
-            # This ensures we have text even if the recognizer didn't provide it
-            log("Constructing text from segments")
-            segments_text = " ".join([segment.get("word", "") for segment in full_result["result"]])
-
-            # If text is empty or just whitespace, use the segments text
-            if not full_result["text"] or full_result["text"].strip() == "":
-                log("Text field is empty, using text constructed from segments")
-                full_result["text"] = segments_text
-            else:
-                log(f"Text field has content: '{full_result['text']}'")
-                # If the text from segments is significantly longer, use it instead
-                if len(segments_text) > len(full_result["text"]) * 1.5:
-                    log("Text from segments is significantly longer, using it instead")
-                    full_result["text"] = segments_text
+        logger.info("Processing audio...")
+        transcription_start_time = time.perf_counter()
+
+        # Parallel decoding always needs word segments to stitch the chunks together
+        if use_vad:
+            ranges = vad_split(audio_path, wav)
+            speech_duration = sum(end - start for start, end in ranges) / wav.framerate
+            logger.info("Found %.2f seconds of speech in %s segments", speech_duration, len(ranges))
+            results = decode_parallel(audio_path, model_path, wav, workers, processes, ranges)
+        elif audio_duration > PARALLEL_MIN_DURATION and workers > 1 and not streaming:
+            results = decode_parallel(audio_path, model_path, wav, workers, processes)
+        else:
+            results = decode_pcm(model, audio_path, wav, wav.data_offset, wav.data_offset + wav.data_length,
+                                 include_words, STREAMING_CHUNK_FRAMES if streaming else CHUNK_FRAMES)
+
+        transcription_time = time.perf_counter() - transcription_start_time
+        logger.info("Audio processed in %.2f seconds", transcription_time)
+
+        full_result = merge_results(results, include_words)
 
         # Add metadata
         full_result["metadata"] = {
@@ -189,17 +753,21 @@ def transcribe_audio(audio_path, model_path, output_path=None):
 
         # Save to file if output path is provided
         if output_path:
-            with open(output_path, "w") as f:
-                json.dump(full_result, f, indent=2)
-            log(f"Transcription saved to {output_path}")
+            with open(output_path, "wb") as f:
+                if compress:
+                    with zstandard.ZstdCompressor(level=6).stream_writer(f) as writer:
+                        writer.write(json_dumps(full_result, pretty))
+                else:
+                    f.write(json_dumps(full_result, pretty))
+            logger.info("Transcription saved to %s", output_path)
 
         return full_result
 
     except Exception as e:
         error_message = str(e)
         error_traceback = traceback.format_exc()
-        log(f"Error transcribing audio: {error_message}")
-        log(error_traceback)
+        logger.error("Error transcribing audio: %s", error_message)
+        logger.error(error_traceback)
 
         return {
             "error": error_message,
@@ -207,15 +775,245 @@ def transcribe_audio(audio_path, model_path, output_path=None):
             "traceback": error_traceback
         }
 
+def _collect_batch_results(recs, stream_results):
+    """
+    Take every result the batch recognizers have ready
+
+    Args:
+        recs (list): Vosk batch recognizers, one per stream
+        stream_results (list): Lists of results to append to, one per stream
+    """
+    for rec, results in zip(recs, stream_results):
+        # Each call pops a single result off the recognizer's queue
+        result = rec.Result()
+        while result:
+            results.append(json_loads(result))
+            result = rec.Result()
+
+def transcribe_audio_batch(audio_paths, model_path, include_words=True):
+    """
+    Transcribe several audio files together on the GPU
+
+    Uses Vosk's batch recognizer, which packs the audio of all the files into
+    batches evaluated together on the GPU. Needs a CUDA enabled build of Vosk.
+    Each file is given the same treatment as by transcribe_audio, apart from
+    saving, so results can be handled the same way.
+
+    Args:
+        audio_paths (list): Paths to audio files
+        model_path (str): Path to Vosk model
+        include_words (bool, optional): Include per-word segments in the results. Defaults to True.
+
+    Returns:
+        list: Transcription result for each audio file, in the same order
+    """
+    deps_ok, deps_error = check_dependencies()
+    if not deps_ok:
+        return [{"error": deps_error, "error_type": "DEPENDENCY_ERROR"}] * len(audio_paths)
+
+    if not hasattr(_vosk(), "BatchRecognizer"):
+        error = {"error": "Vosk batch recognizer not available. Please install a CUDA enabled build of Vosk",
+                 "error_type": "DEPENDENCY_ERROR"}
+        return [error] * len(audio_paths)
+
+    model_ok, model_error = check_model(model_path)
+    if not model_ok:
+        return [{"error": model_error, "error_type": "MODEL_ERROR"}] * len(audio_paths)
+
+    batch_results = [None] * len(audio_paths)
+    streams = []
+    for i, audio_path in enumerate(audio_paths):
+        audio_ok, audio_error, wav = check_audio_file(audio_path)
+        if audio_ok:
+            streams.append((i, audio_path, wav))
+        else:
+            batch_results[i] = {"error": audio_error, "error_type": "AUDIO_FILE_ERROR"}
+
+    if not streams:
+        return batch_results
+
+    try:
+        logger.info("Loading batch model from %s...", model_path)
+        start_time = time.perf_counter()
+        model = get_batch_model(model_path)
+        model_load_time = time.perf_counter() - start_time
+        logger.info("Batch model loaded in %.2f seconds", model_load_time)
+
+        logger.info("Processing %s audio files...", len(streams))
+        transcription_start_time = time.perf_counter()
+
+        files = []
+        mms = []
+        try:
+            for _, audio_path, _ in streams:
+                files.append(open(audio_path, "rb"))
+                mms.append(mmap.mmap(files[-1].fileno(), 0, access=mmap.ACCESS_READ))
+            recs = [_vosk().BatchRecognizer(model, wav.framerate) for _, _, wav in streams]
+            offsets = [wav.data_offset for _, _, wav in streams]
+            stream_results = [[] for _ in streams]
+            active = set(range(len(streams)))
+
+            # Feed every stream a block per round, then let the GPU decode the batch
+            while active:
+                for j in list(active):
+                    wav = streams[j][2]
+                    end = wav.data_offset + wav.data_length
+                    if offsets[j] >= end:
+                        recs[j].FinishStream()
+                        active.discard(j)
+                        continue
+                    block_end = min(offsets[j] + STREAMING_CHUNK_FRAMES * wav.channels * wav.sample_width, end)
+                    recs[j].AcceptWaveform(mms[j][offsets[j]:block_end])
+                    offsets[j] = block_end
+
+                model.Wait()
+                _collect_batch_results(recs, stream_results)
+
+            # Finished streams can still have chunks queued on the GPU
+            while any(rec.GetPendingChunks() for rec in recs):
+                model.Wait()
+                _collect_batch_results(recs, stream_results)
+        finally:
+            for mm in mms:
+                mm.close()
+            for f in files:
+                f.close()
+
+        transcription_time = time.perf_counter() - transcription_start_time
+        logger.info("Audio processed in %.2f seconds", transcription_time)
+
+        for (i, _, wav), results in zip(streams, stream_results):
+            audio_duration = wav.data_length / (wav.channels * wav.sample_width * wav.framerate)
+            full_result = merge_results(results, include_words)
+            full_result["metadata"] = {
+                "audio_duration": audio_duration,
+                "model_load_time": model_load_time,
+                "transcription_time": transcription_time,
+                "real_time_factor": transcription_time / audio_duration if audio_duration > 0 else 0,
+                "model": os.path.basename(model_path),
+                "timestamp": time.time()
+            }
+            batch_results[i] = full_result
+
+        return batch_results
+
+    except Exception as e:
+        error_message = str(e)
+        error_traceback = traceback.format_exc()
+        logger.error("Error transcribing audio batch: %s", error_message)
+        logger.error(error_traceback)
+
+        error = {
+            "error": error_message,
+            "error_type": "TRANSCRIPTION_ERROR",
+            "traceback": error_traceback
+        }
+        return [result or error for result in batch_results]
+
+def serve_stdin(default_model_path, default_workers=PARALLEL_WORKERS, default_processes=False, preload=True):
+    """
+    Transcribe audio files requested on stdin, one JSON object per line
+
+    Each request has the form {"audio_path": ..., "model": ..., "output_path": ...}
+    where everything but "audio_path" is optional. A request with a list of
+    "audio_paths" instead is transcribed with transcribe_audio_batch, and
+    answered with {"results": [...]}. Requests may also set "pretty", "words",
+    "zstd", "workers", "processes", "streaming" and "vad", matching the command
+    line flags. Each result is written to stdout as a single JSON line, echoing
+    the request "id" if there is one.
+    Models stay loaded between requests, and the default model is loaded up
+    front so the first request doesn't wait for it.
+
+    Args:
+        default_model_path (str): Model used when a request doesn't name one
+        default_workers (int, optional): Workers used when a request doesn't set them. Defaults to PARALLEL_WORKERS.
+        default_processes (bool, optional): Whether requests use worker processes by default. Defaults to False.
+        preload (bool, optional): Load the default model before reading the first request. Defaults to True.
+    """
+    # Get the default model's files off the disk while Vosk starts up
+    if os.path.isdir(default_model_path):
+        start_prefault_model(default_model_path)
+
+    if preload:
+        model_ok, model_error = warm_model(default_model_path)
+        if not model_ok:
+            logger.warning("Could not preload model: %s", model_error)
+
+    # Requests are parsed straight from the raw bytes, like Vosk's results
+    for line in sys.stdin.buffer:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json_loads(line)
+        except ValueError as e:
+            write_json_line({"error": f"Invalid request: {str(e)}", "error_type": "REQUEST_ERROR"})
+            continue
+        if not isinstance(request, dict):
+            write_json_line({"error": "Invalid request: expected a JSON object", "error_type": "REQUEST_ERROR"})
+            continue
+
+        if request.get("audio_paths"):
+            result = {"results": transcribe_audio_batch(
+                request["audio_paths"],
+                request.get("model") or default_model_path,
+                include_words=request.get("words", True)
+            )}
+        elif not request.get("audio_path"):
+            result = {"error": "Request has no audio_path", "error_type": "REQUEST_ERROR"}
+        else:
+            result = transcribe_audio(
+                request["audio_path"],
+                request.get("model") or default_model_path,
+                request.get("output_path"),
+                pretty=request.get("pretty", False),
+                include_words=request.get("words", True),
+                compress=request.get("zstd", False),
+                workers=request.get("workers") or default_workers,
+                processes=request.get("processes", default_processes),
+                streaming=request.get("streaming", False),
+                use_vad=request.get("vad", False)
+            )
+
+        if "id" in request:
+            result["id"] = request["id"]
+
+        write_json_line(result)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Transcribe audio using Vosk")
-    parser.add_argument("audio_path", help="Path to audio file")
+    parser.add_argument("audio_path", nargs="?", help="Path to audio file")
     parser.add_argument("--model", default="models/vosk-model-en-us-large", help="Path to Vosk model")
     parser.add_argument("--output", help="Path to save transcription")
+    parser.add_argument("--pretty", action="store_true", help="Indent the saved transcription")
+    parser.add_argument("--no-words", dest="words", action="store_false", help="Leave per-word segments out of the result")
+    parser.add_argument("--zstd", action="store_true", help="Compress the saved transcription with zstd")
+    parser.add_argument("--workers", type=int, default=PARALLEL_WORKERS, help="Number of chunks of long audio decoded at the same time")
+    parser.add_argument("--processes", action="store_true", help="Decode long audio in worker processes rather than threads")
+    parser.add_argument("--streaming", action="store_true", help="Feed the audio in small blocks through a single recognizer, as for live audio")
+    parser.add_argument("--vad", action="store_true", help="Only decode the parts of the audio that contain speech")
+    parser.add_argument("--serve", action="store_true", help="Read transcription requests from stdin as JSON lines")
+    parser.add_argument("--no-preload", dest="preload", action="store_false", help="With --serve, load models on first use rather than at startup")
 
     args = parser.parse_args()
 
-    result = transcribe_audio(args.audio_path, args.model, args.output)
+    # VOSK_LOG_LEVEL=WARNING leaves out the progress and timing messages
+    logging.basicConfig(stream=sys.stderr, level=os.environ.get("VOSK_LOG_LEVEL", "INFO").upper(),
+                        format="%(message)s")
+
+    if args.serve:
+        serve_stdin(args.model, args.workers, args.processes, args.preload)
+        sys.exit(0)
+
+    if not args.audio_path:
+        parser.error("audio_path is required unless --serve is given")
+
+    # One-shot runs reload the model every time; the server uses --serve
+    logger.warning("Note: running a single transcription is deprecated, use --serve to keep the model loaded between files")
+
+    result = transcribe_audio(args.audio_path, args.model, args.output, args.pretty, args.words, args.zstd,
+                              args.workers, args.processes, args.streaming, args.vad)
 
     # Print result to stdout
-    print(json.dumps(result))
+    write_json_line(result)